@@ -5,8 +5,9 @@ import os
 from typing import Dict
 from telethon import events
 from telethon.tl.custom import Button
-from config import app, RECORDING_PATH
+from config import app, RECORDING_PATH, ADMIN_IDS
 import utils
+import stats
 
 class RecordingState:
     def __init__(self, chat_id):
@@ -47,8 +48,10 @@ def calculate_schedule(start_time, end_time):
     duration_minutes = (end_dt - start_dt).total_seconds() / 60
     return duration_minutes, start_dt, end_dt
 
-async def run_recording(chat_id, url, start_dt, duration_minutes, end_dt):
+async def run_recording(chat_id, url, start_dt, duration_minutes, end_dt, trace=None):
     recorded_file = None
+    if trace is None:
+        trace = stats.new_trace(chat_id, start_dt)
     # Filename format: 16Dec2025 [14:30-15:30]
     date_str = start_dt.strftime("%d%b%Y")
     start_time_str = start_dt.strftime("%H:%M")
@@ -67,7 +70,7 @@ async def run_recording(chat_id, url, start_dt, duration_minutes, end_dt):
         cancel_event = asyncio.Event()
         
         recording_task = asyncio.create_task(
-            utils.record_stream_async(url, duration_minutes, base_filename, cancel_event)
+            utils.record_stream_async(url, duration_minutes, base_filename, cancel_event, trace)
         )
         
         active_recordings[chat_id] = ActiveRecording(chat_id, recording_task, cancel_event)
@@ -110,16 +113,18 @@ async def run_recording(chat_id, url, start_dt, duration_minutes, end_dt):
                     pass
         
         try:
-            await app.send_file(
-                chat_id,
-                recorded_file,
-                caption=f"✅ **Recording Complete**\n\n"
-                        f"📁 {base_filename}.mp4\n"
-                        f"💾 {file_size:.1f} MB • {duration_minutes:.0f} min\n"
-                        f"📺 480p @ 800kbps",
-                supports_streaming=True,
-                progress_callback=upload_progress
-            )
+            with trace.span("upload") as span:
+                span.bytes = os.path.getsize(recorded_file)
+                await app.send_file(
+                    chat_id,
+                    recorded_file,
+                    caption=f"✅ **Recording Complete**\n\n"
+                            f"📁 {base_filename}.mp4\n"
+                            f"💾 {file_size:.1f} MB • {duration_minutes:.0f} min\n"
+                            f"📺 480p @ 800kbps",
+                    supports_streaming=True,
+                    progress_callback=upload_progress
+                )
             
             await app.delete_messages(chat_id, upload_msg.id)
             
@@ -159,10 +164,13 @@ async def schedule_recording(chat_id, url, start_time, end_time):
     if delay_seconds < 0:
         delay_seconds = 0
     
+    # Queue wait runs from the due time until ffmpeg spawns
+    trace = stats.new_trace(chat_id, start_dt)
+    
     async def scheduled_job():
         if delay_seconds > 0:
             await asyncio.sleep(delay_seconds)
-        await run_recording(chat_id, url, start_dt, duration_minutes, end_dt)
+        await run_recording(chat_id, url, start_dt, duration_minutes, end_dt, trace)
     
     task = asyncio.create_task(scheduled_job())
     scheduled_jobs[chat_id] = task
@@ -283,6 +291,14 @@ async def cancel_command(event):
     else:
         await event.reply("ℹ️ **No active job**")
 
+@app.on(events.NewMessage(pattern='/stats'))
+async def stats_command(event):
+    if event.sender_id not in ADMIN_IDS:
+        await event.reply("❌ **Not authorized**")
+        return
+    
+    await event.reply(stats.format_summary(len(active_recordings), len(scheduled_jobs)))
+
 @app.on(events.NewMessage)
 async def message_handler(event):
     user_id = event.chat_id
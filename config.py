@@ -16,6 +16,21 @@ except (TypeError, ValueError):
 
 RECORDING_PATH = "[use your own path]"
 
+# Comma-separated Telegram user IDs allowed to use /stats
+ADMIN_IDS = {int(x) for x in os.environ.get("ADMIN_IDS", "").split(",") if x.strip().isdigit()}
+
+def _positive_int(name, default):
+    value = os.environ.get(name, "").strip()
+    if value.isdigit() and int(value) > 0:
+        return int(value)
+    return default
+
+# Job stage spans kept in memory, and optional JSON lines export file
+STATS_HISTORY = _positive_int("STATS_HISTORY", 2000)
+STATS_LOG_PATH = os.environ.get("STATS_LOG_PATH", "").strip()
+# Export is rotated to STATS_LOG_PATH.1 once it exceeds this size
+STATS_LOG_MAX_BYTES = _positive_int("STATS_LOG_MAX_BYTES", 10 * 1024 * 1024)
+
 def initialize_client():
     print("Connecting to Telegram...")
     client = TelegramClient(
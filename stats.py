@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import uuid
+import datetime
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, List, Optional, Tuple
+from config import STATS_HISTORY, STATS_LOG_PATH, STATS_LOG_MAX_BYTES
+
+# Order used when rendering /stats
+STAGES = ["queue", "probe", "capture", "remux", "upload"]
+
+class SpanStore:
+    """
+    Rolling in-memory store of finished spans, mirrored to a JSON lines file
+    """
+    def __init__(self, max_spans: int, log_path: Optional[str] = None, log_max_bytes: int = 0):
+        self.spans: Deque[dict] = deque(maxlen=max_spans)
+        # Captures still running: job_id -> (temp file, start)
+        self.active_captures: Dict[str, Tuple[str, float]] = {}
+        self.log_path = log_path
+        self.log_max_bytes = log_max_bytes
+
+        if self.log_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+            except Exception as e:
+                print(f"[stats] Export disabled, cannot create directory: {e}")
+                self.log_path = None
+
+    def add(self, span: dict):
+        self.spans.append(span)
+
+        if not self.log_path:
+            return
+
+        try:
+            # Keep a single rotated file, like the docker json-file log driver
+            if self.log_max_bytes and os.path.exists(self.log_path) \
+                    and os.path.getsize(self.log_path) >= self.log_max_bytes:
+                os.replace(self.log_path, self.log_path + ".1")
+
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(span) + "\n")
+        except Exception as e:
+            print(f"[stats] Failed to write span: {e}")
+
+    def durations(self, stage: str) -> List[float]:
+        return [s["duration"] for s in self.spans if s["stage"] == stage and s["status"] == "ok"]
+
+    def failures(self, stage: str) -> int:
+        return sum(1 for s in self.spans if s["stage"] == stage and s["status"] != "ok")
+
+    def rate(self, stage: str, window_seconds: float = 3600) -> Optional[float]:
+        """
+        Bytes per second while a stage was running, for spans that ended within the window
+        """
+        cutoff = time.time() - window_seconds
+        total_bytes = 0
+        total_time = 0.0
+        for s in self.spans:
+            if s["stage"] == stage and s["status"] == "ok" and s["end"] >= cutoff:
+                total_bytes += s["bytes"]
+                total_time += s["duration"]
+
+        if total_time <= 0 or total_bytes <= 0:
+            return None
+        return total_bytes / total_time
+
+    def load(self, stage: str, window_seconds: float = 3600) -> float:
+        """
+        Bytes per wall-clock second a stage processed over the window, across all jobs
+
+        Running captures count with the current size of their temp file
+        """
+        now = time.time()
+        cutoff = now - window_seconds
+        total_bytes = 0.0
+
+        if stage == "capture":
+            for path, start in list(self.active_captures.values()):
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    continue
+                elapsed = now - start
+                if elapsed > 0:
+                    total_bytes += size * min((now - max(start, cutoff)) / elapsed, 1.0)
+
+        for s in self.spans:
+            if s["stage"] != stage or s["status"] != "ok":
+                continue
+            overlap = min(s["end"], now) - max(s["start"], cutoff)
+            if overlap <= 0:
+                continue
+            # Only count the share of the span that falls inside the window
+            if s["duration"] > 0:
+                total_bytes += s["bytes"] * min(overlap / s["duration"], 1.0)
+            else:
+                total_bytes += s["bytes"]
+        return total_bytes / window_seconds
+
+    def jobs_completed(self, window_seconds: float = 3600) -> int:
+        cutoff = time.time() - window_seconds
+        return len({s["job_id"] for s in self.spans
+                    if s["stage"] == "upload" and s["status"] == "ok" and s["end"] >= cutoff})
+
+class Span:
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.bytes = 0
+        self.status = "ok"
+
+class JobTrace:
+    """
+    Collects the stage spans of a single recording job
+    """
+    def __init__(self, chat_id: int, store: "SpanStore", due: Optional[float] = None):
+        self.job_id = uuid.uuid4().hex[:8]
+        self.chat_id = chat_id
+        self.store = store
+        self.due = due
+
+    def record(self, stage: str, start: float, duration: float, nbytes: int = 0, status: str = "ok"):
+        if stage == "capture":
+            self.store.active_captures.pop(self.job_id, None)
+        self.store.add({
+            "job_id": self.job_id,
+            "chat_id": self.chat_id,
+            "stage": stage,
+            "start": round(start, 3),
+            "end": round(start + max(duration, 0.0), 3),
+            "duration": round(max(duration, 0.0), 3),
+            "bytes": nbytes,
+            "status": status,
+        })
+
+    def begin_capture(self, path: str, start: float):
+        """
+        Marks the capture as running so /stats can count its bytes before it ends
+        """
+        self.store.active_captures[self.job_id] = (path, start)
+
+    def end_queue(self):
+        """
+        Closes the queue span: time from the scheduled start until ffmpeg is about to spawn
+        """
+        if self.due is None:
+            return
+        self.record("queue", self.due, time.time() - self.due)
+        self.due = None
+
+    @contextmanager
+    def span(self, stage: str):
+        """
+        Times the enclosed block; set `.bytes` and `.status` on the yielded span
+        """
+        span = Span(stage)
+        wall_start = time.time()
+        perf_start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = type(e).__name__
+            raise
+        finally:
+            self.record(stage, wall_start, time.perf_counter() - perf_start, span.bytes, span.status)
+
+store = SpanStore(STATS_HISTORY, STATS_LOG_PATH, STATS_LOG_MAX_BYTES)
+
+def new_trace(chat_id: int, scheduled_start: Optional[datetime.datetime] = None) -> JobTrace:
+    """
+    Starts a job trace; call it when the job is scheduled
+
+    The queue span runs from the scheduled start, or from now when that is
+    already past (start times are whole minutes and may be up to 60s old)
+    """
+    due = None
+    if scheduled_start is not None:
+        due = max(scheduled_start.timestamp(), time.time())
+    return JobTrace(chat_id, store, due)
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile
+    """
+    ordered = sorted(values)
+    rank = max(int(-(-pct * len(ordered) // 100)), 1)
+    return ordered[rank - 1]
+
+def format_seconds(seconds: float) -> str:
+    if seconds < 1:
+        return f"{seconds * 1000:.0f}ms"
+    if seconds < 120:
+        return f"{seconds:.1f}s"
+    return f"{seconds / 60:.1f}m"
+
+def format_summary(active_jobs: int, scheduled_jobs: int) -> str:
+    lines = [
+        "📊 **Stats**\n",
+        f"⏺ Active: {active_jobs} • ⏰ Scheduled: {scheduled_jobs}",
+        f"🧾 Spans kept: {len(store.spans)}/{store.spans.maxlen}\n",
+    ]
+
+    if not any(store.durations(s) or store.failures(s) for s in STAGES):
+        lines.append("No jobs recorded yet")
+        return "\n".join(lines)
+
+    for stage in STAGES:
+        durations = store.durations(stage)
+        failed = store.failures(stage)
+        if not durations:
+            if failed:
+                lines.append(f"**{stage}**: no successful spans • {failed} failed")
+            continue
+
+        line = (
+            f"**{stage}** (n={len(durations)}): "
+            f"p50 {format_seconds(percentile(durations, 50))} • "
+            f"p95 {format_seconds(percentile(durations, 95))} • "
+            f"p99 {format_seconds(percentile(durations, 99))}"
+        )
+        if failed:
+            line += f" • {failed} failed"
+        lines.append(line)
+
+    lines.append("\n**Load (last hour)**")
+    lines.append(f"Jobs completed: {store.jobs_completed()}")
+    lines.append(
+        f"Ingest: {store.load('capture') * 8 / 1000:.0f} kbps across all jobs "
+        f"({len(store.active_captures)} recording now)"
+    )
+    for stage in ["remux", "upload"]:
+        rate = store.rate(stage)
+        if rate is not None:
+            lines.append(f"{stage} speed: {rate / (1024 * 1024):.2f} MB/s")
+
+    lines.append(f"\n🕐 {datetime.datetime.now().strftime('%d %b %Y %H:%M')}")
+
+    return "\n".join(lines)
@@ -0,0 +1,13 @@
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing the real config starts a Telegram client, so tests use a stub
+config = types.ModuleType("config")
+config.STATS_HISTORY = 100
+config.STATS_LOG_PATH = ""
+config.STATS_LOG_MAX_BYTES = 0
+sys.modules["config"] = config
+config.RECORDING_PATH = "recordings"
@@ -0,0 +1,204 @@
+import asyncio
+import os
+import time
+import pytest
+import stats
+import utils
+
+class FakeProcess:
+    def __init__(self):
+        self.returncode = None
+        self.stderr = None
+        self.killed = False
+        self._done = asyncio.Event()
+
+    async def wait(self):
+        await self._done.wait()
+        return self.returncode
+
+    def finish(self, code=0):
+        if self.returncode is None:
+            self.returncode = code
+            self._done.set()
+
+    def kill(self):
+        self.killed = True
+        self.finish(-9)
+
+def write(path, nbytes):
+    with open(path, "wb") as f:
+        f.write(b"x" * nbytes)
+
+async def hang(proc, out):
+    await asyncio.Event().wait()
+
+def record_writes(nbytes, before=0.2, after=0.2):
+    async def behave(proc, out):
+        await asyncio.sleep(before)
+        if nbytes:
+            write(out, nbytes)
+        await asyncio.sleep(after)
+        proc.finish()
+    return behave
+
+def record_then_hang(nbytes):
+    async def behave(proc, out):
+        await asyncio.sleep(0.1)
+        write(out, nbytes)
+        await asyncio.Event().wait()
+    return behave
+
+def convert_writes(nbytes):
+    async def behave(proc, out):
+        await asyncio.sleep(0.1)
+        if nbytes:
+            write(out, nbytes)
+        proc.finish()
+    return behave
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    """
+    Patches ffmpeg with fake processes; set env.record / env.convert to their behaviour
+    """
+    class Env:
+        record = None
+        convert = None
+        processes = []
+        store = stats.SpanStore(100)
+
+    def fake_exec(*cmd, **kwargs):
+        proc = FakeProcess()
+        Env.processes.append(proc)
+        out = cmd[-1]
+        behave = Env.record if out.endswith(".mkv") else Env.convert
+        asyncio.get_event_loop().create_task(behave(proc, out))
+        return proc
+
+    async def create_subprocess_exec(*cmd, **kwargs):
+        return fake_exec(*cmd, **kwargs)
+
+    monkeypatch.setattr(utils, "RECORDING_PATH", str(tmp_path))
+    monkeypatch.setattr(utils, "PROBE_POLL_INTERVAL", 0.02)
+    monkeypatch.setattr(utils.asyncio, "create_subprocess_exec", create_subprocess_exec)
+    Env.tmp_path = tmp_path
+    return Env
+
+def run(env, cancel_event=None, cancel_after=None):
+    trace = stats.JobTrace(1, env.store, due=time.time())
+
+    async def main():
+        task = asyncio.create_task(
+            utils.record_stream_async("http://stream", 1, "job", cancel_event, trace)
+        )
+        if cancel_after is not None:
+            await asyncio.sleep(cancel_after)
+            task.cancel()
+        return await task
+
+    return asyncio.run(main())
+
+def spans(env):
+    return {s["stage"]: s for s in env.store.spans}
+
+def stages(env):
+    return [s["stage"] for s in env.store.spans]
+
+def test_successful_job_records_every_stage(env):
+    env.record = record_writes(200_000)
+    env.convert = convert_writes(150_000)
+
+    assert run(env) == os.path.join(str(env.tmp_path), "job.mp4")
+
+    assert stages(env) == ["queue", "probe", "capture", "remux"]
+    by_stage = spans(env)
+    assert all(s["status"] == "ok" for s in env.store.spans)
+    assert by_stage["probe"]["duration"] == pytest.approx(0.2, abs=0.1)
+    assert by_stage["capture"]["start"] == pytest.approx(by_stage["probe"]["end"], abs=0.01)
+    assert by_stage["capture"]["bytes"] == 200_000
+    assert by_stage["remux"]["bytes"] == 150_000
+    assert env.store.active_captures == {}
+
+def test_probe_fails_without_output(env):
+    env.record = record_writes(0)
+
+    assert run(env) is None
+
+    assert stages(env) == ["queue", "probe"]
+    assert spans(env)["probe"]["status"] == "no_output"
+
+def test_capture_too_small(env):
+    env.record = record_writes(10)
+
+    assert run(env) is None
+
+    assert stages(env) == ["queue", "probe", "capture"]
+    by_stage = spans(env)
+    assert by_stage["probe"]["status"] == "ok"
+    assert (by_stage["capture"]["status"], by_stage["capture"]["bytes"]) == ("too_small", 10)
+
+def test_probe_fallback_when_watcher_missed_output(env, monkeypatch):
+    monkeypatch.setattr(utils, "PROBE_POLL_INTERVAL", 60)
+    env.record = record_writes(200_000, before=0.05, after=0)
+    env.convert = convert_writes(150_000)
+
+    assert run(env) is not None
+
+    assert stages(env) == ["queue", "probe", "capture", "remux"]
+    assert spans(env)["probe"]["status"] == "ok"
+
+def test_remux_timeout(env, monkeypatch):
+    monkeypatch.setattr(utils, "CONVERT_TIMEOUT", 0.1)
+    env.record = record_writes(200_000)
+    env.convert = hang
+
+    assert run(env) is None
+
+    assert spans(env)["remux"]["status"] == "timeout"
+    assert env.processes[-1].killed
+
+@pytest.mark.parametrize("nbytes, status", [(0, "no_output"), (10, "too_small")])
+def test_remux_bad_output(env, nbytes, status):
+    env.record = record_writes(200_000)
+    env.convert = convert_writes(nbytes)
+
+    assert run(env) is None
+
+    assert spans(env)["remux"]["status"] == status
+
+def test_cancel_event_before_output(env):
+    env.record = hang
+    cancel_event = asyncio.Event()
+    cancel_event.set()
+
+    with pytest.raises(utils.RecordingCancelled):
+        run(env, cancel_event)
+
+    assert stages(env) == ["queue", "probe"]
+    assert spans(env)["probe"]["status"] == "cancelled"
+    assert env.processes[0].killed
+
+def test_task_cancelled_during_capture(env):
+    env.record = record_then_hang(200_000)
+
+    with pytest.raises(asyncio.CancelledError):
+        run(env, cancel_after=0.3)
+
+    assert stages(env) == ["queue", "probe", "capture"]
+    assert spans(env)["capture"]["status"] == "cancelled"
+    assert env.store.active_captures == {}
+    assert env.processes[0].killed
+    assert os.listdir(env.tmp_path) == []
+
+def test_task_cancelled_during_remux(env):
+    env.record = record_writes(200_000, before=0.1, after=0.1)
+    env.convert = hang
+
+    with pytest.raises(asyncio.CancelledError):
+        run(env, cancel_after=0.5)
+
+    assert stages(env) == ["queue", "probe", "capture", "remux"]
+    assert spans(env)["capture"]["status"] == "ok"
+    assert spans(env)["remux"]["status"] == "cancelled"
+    assert env.processes[-1].killed
+    assert os.listdir(env.tmp_path) == []
@@ -0,0 +1,161 @@
+import json
+import datetime
+import time
+import pytest
+import stats
+
+def make_store(**kwargs):
+    return stats.SpanStore(100, **kwargs)
+
+def add_span(store, stage, start, duration, nbytes=0, status="ok", job_id="job"):
+    store.add({
+        "job_id": job_id,
+        "chat_id": 1,
+        "stage": stage,
+        "start": start,
+        "end": start + duration,
+        "duration": duration,
+        "bytes": nbytes,
+        "status": status,
+    })
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 11))
+    assert stats.percentile(values, 50) == 5
+    assert stats.percentile(values, 95) == 10
+    assert stats.percentile(values, 99) == 10
+    assert stats.percentile([3, 1, 2], 50) == 2
+    assert stats.percentile([7], 99) == 7
+
+def test_durations_and_failures_split_by_status():
+    store = make_store()
+    now = time.time()
+    add_span(store, "remux", now, 2.0)
+    add_span(store, "remux", now, 4.0, status="timeout")
+    add_span(store, "upload", now, 1.0)
+
+    assert store.durations("remux") == [2.0]
+    assert store.failures("remux") == 1
+    assert store.failures("upload") == 0
+
+def test_rate_uses_stage_time_within_window():
+    store = make_store()
+    now = time.time()
+    add_span(store, "upload", now - 10, 5.0, nbytes=10_000_000)
+    add_span(store, "upload", now - 10, 5.0, nbytes=30_000_000)
+    add_span(store, "upload", now - 7200, 1.0, nbytes=99_000_000)
+    add_span(store, "upload", now - 10, 5.0, nbytes=50_000_000, status="ConnectionError")
+
+    assert store.rate("upload") == pytest.approx(4_000_000)
+    assert store.rate("remux") is None
+
+def test_load_prorates_spans_crossing_the_window():
+    store = make_store()
+    now = time.time()
+    # Half of this span lies inside the last hour
+    add_span(store, "capture", now - 3600 - 1800, 3600, nbytes=7_200_000)
+    add_span(store, "capture", now - 1800, 1800, nbytes=3_600_000)
+
+    assert store.load("capture") == pytest.approx((3_600_000 + 3_600_000) / 3600, rel=1e-3)
+
+def test_jobs_completed_counts_successful_uploads():
+    store = make_store()
+    now = time.time()
+    add_span(store, "upload", now - 60, 1.0, job_id="a")
+    add_span(store, "upload", now - 60, 1.0, job_id="b", status="ValueError")
+    add_span(store, "upload", now - 7200, 1.0, job_id="c")
+
+    assert store.jobs_completed() == 1
+
+def test_span_records_status_bytes_and_exceptions():
+    store = make_store()
+    trace = stats.JobTrace(1, store)
+
+    with trace.span("remux") as span:
+        span.bytes = 123
+    with trace.span("remux") as span:
+        span.status = "too_small"
+    with pytest.raises(ValueError):
+        with trace.span("upload"):
+            raise ValueError()
+
+    remux_ok, remux_small, upload = store.spans
+    assert (remux_ok["status"], remux_ok["bytes"]) == ("ok", 123)
+    assert remux_small["status"] == "too_small"
+    assert upload["status"] == "ValueError"
+    assert all(s["job_id"] == trace.job_id for s in store.spans)
+
+def test_end_queue_records_once_from_due_time():
+    store = make_store()
+    trace = stats.JobTrace(1, store, due=time.time() - 30)
+
+    trace.end_queue()
+    trace.end_queue()
+
+    assert len(store.spans) == 1
+    assert store.spans[0]["stage"] == "queue"
+    assert store.spans[0]["duration"] == pytest.approx(30, abs=1)
+
+def test_export_creates_directory_and_rotates(tmp_path):
+    path = tmp_path / "nested" / "stats.jsonl"
+    store = make_store(log_path=str(path), log_max_bytes=200)
+
+    for _ in range(5):
+        add_span(store, "upload", time.time(), 1.0)
+
+    rotated = tmp_path / "nested" / "stats.jsonl.1"
+    assert rotated.exists()
+    for line in path.read_text().splitlines() + rotated.read_text().splitlines():
+        assert json.loads(line)["stage"] == "upload"
+
+def test_format_summary_without_data(monkeypatch):
+    monkeypatch.setattr(stats, "store", make_store())
+    assert "No jobs recorded yet" in stats.format_summary(0, 0)
+
+def test_new_trace_due_is_never_in_the_past():
+    # "Start now" jobs use the typed minute, which can be up to 60s old
+    trace = stats.new_trace(1, datetime.datetime.now() - datetime.timedelta(seconds=50))
+    trace.store = make_store()
+    trace.end_queue()
+
+    assert trace.store.spans[0]["duration"] == pytest.approx(0, abs=1)
+
+def test_new_trace_due_is_scheduled_start_when_in_future():
+    start = datetime.datetime.now() + datetime.timedelta(minutes=5)
+    assert stats.new_trace(1, start).due == pytest.approx(start.timestamp())
+
+def test_load_counts_running_captures(tmp_path):
+    store = make_store()
+    trace = stats.JobTrace(1, store)
+    temp_file = tmp_path / "a_temp.mkv"
+    temp_file.write_bytes(b"x" * 3_600_000)
+
+    trace.begin_capture(str(temp_file), time.time() - 1800)
+    assert store.load("capture") == pytest.approx(1000, rel=1e-2)
+
+    trace.record("capture", time.time() - 1800, 1800, 3_600_000)
+    assert store.active_captures == {}
+    assert store.load("capture") == pytest.approx(1000, rel=1e-2)
+
+def test_format_summary_with_data(monkeypatch):
+    store = make_store()
+    monkeypatch.setattr(stats, "store", store)
+    now = time.time()
+    for i in range(1, 11):
+        add_span(store, "remux", now - 60, float(i), nbytes=10 * 1024 * 1024, job_id=str(i))
+    add_span(store, "remux", now - 60, 3.0, status="timeout")
+    add_span(store, "upload", now - 30, 2.0, nbytes=4 * 1024 * 1024, job_id="1")
+    add_span(store, "probe", now - 60, 1.0, status="no_output")
+
+    summary = stats.format_summary(2, 1)
+
+    assert "Active: 2 • ⏰ Scheduled: 1" in summary
+    assert "**remux** (n=10): p50 5.0s • p95 10.0s • p99 10.0s • 1 failed" in summary
+    assert "**upload** (n=1): p50 2.0s • p95 2.0s • p99 2.0s" in summary
+    assert "**probe**: no successful spans • 1 failed" in summary
+    assert "**queue**" not in summary
+    assert "**Load (last hour)**" in summary
+    assert "Jobs completed: 1" in summary
+    assert "remux speed: 1.82 MB/s" in summary
+    assert "upload speed: 2.00 MB/s" in summary
+    assert "Ingest: 0 kbps across all jobs (0 recording now)" in summary
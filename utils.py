@@ -1,7 +1,14 @@
 import os
+import time
 import asyncio
 from typing import Optional
 from config import RECORDING_PATH
+from stats import JobTrace
+
+# How often the temp file is checked for the first recorded bytes (probe end)
+PROBE_POLL_INTERVAL = 0.25
+# Seconds allowed for the MKV to MP4 conversion
+CONVERT_TIMEOUT = 600
 
 class RecordingCancelled(Exception):
     pass
@@ -10,10 +17,15 @@ async def record_stream_async(
     url: str,
     duration_minutes: float,
     filename: str,
-    cancel_event: Optional[asyncio.Event] = None
+    cancel_event: Optional[asyncio.Event] = None,
+    trace: Optional[JobTrace] = None
 ) -> Optional[str]:
     """
     M3U8 recording with proper duration control
+
+    When a trace is given, its queue span is closed right before ffmpeg
+    spawns, and probe (ffmpeg start until first output bytes), capture and
+    remux spans are recorded on it
     """
     os.makedirs(RECORDING_PATH, exist_ok=True)
     
@@ -69,18 +81,79 @@ async def record_stream_async(
     ]
     
     process = None
+    convert_process = None
     start_time = asyncio.get_event_loop().time()
     max_duration = duration_sec + 60  # Safety: max duration + 1 minute buffer
     
+    # Tracing state, only used when a trace is given
+    spawn_wall = spawn_at = None
+    probe_end = None
+    probe_watcher = None
+    capture_traced = False
+    remux_wall = remux_at = None
+    remux_traced = False
+    
+    def trace_probe():
+        # First output bytes: probe ends and capture starts
+        nonlocal probe_end
+        probe_end = asyncio.get_event_loop().time()
+        trace.record("probe", spawn_wall, probe_end - spawn_at)
+        trace.begin_capture(temp_file, spawn_wall + (probe_end - spawn_at))
+    
+    async def watch_first_output():
+        while probe_end is None:
+            try:
+                if os.path.getsize(temp_file) > 0:
+                    trace_probe()
+                    return
+            except OSError:
+                pass
+            await asyncio.sleep(PROBE_POLL_INTERVAL)
+    
+    def trace_capture(status: str, nbytes: int = 0):
+        # Probe and capture span the whole ffmpeg run, so they are closed by hand
+        nonlocal capture_traced
+        if not trace or spawn_at is None or capture_traced:
+            return
+        capture_traced = True
+        now = asyncio.get_event_loop().time()
+        if probe_end is None:
+            trace.record("probe", spawn_wall, now - spawn_at, status=status)
+            return
+        trace.record("capture", spawn_wall + (probe_end - spawn_at), now - probe_end, nbytes, status)
+    
+    def trace_remux(status: str, nbytes: int = 0):
+        nonlocal remux_traced
+        if not trace or remux_at is None or remux_traced:
+            return
+        remux_traced = True
+        trace.record("remux", remux_wall, time.perf_counter() - remux_at, nbytes, status)
+    
+    def trace_failure(status: str):
+        # Close whichever stage was running when the job failed
+        trace_capture(status)
+        trace_remux(status)
+    
     try:
         print(f"[{filename}] Recording for {duration_minutes:.0f} minutes")
         
+        # ffmpeg -y overwrites it anyway; a leftover would end the probe early
+        cleanup_file(temp_file)
+        
+        if trace:
+            trace.end_queue()
+            spawn_wall = time.time()
+            spawn_at = asyncio.get_event_loop().time()
+        
         process = await asyncio.create_subprocess_exec(
             *record_cmd,
             stdout=asyncio.subprocess.DEVNULL,
             stderr=asyncio.subprocess.PIPE
         )
         
+        if trace:
+            probe_watcher = asyncio.create_task(watch_first_output())
+        
         # Monitor with timeout enforcement
         while process.returncode is None:
             # Check cancellation
@@ -114,18 +187,28 @@ async def record_stream_async(
         actual_duration = asyncio.get_event_loop().time() - start_time
         print(f"[{filename}] Process ended after {actual_duration:.0f} seconds (target: {duration_sec}s)")
         
+        if probe_watcher:
+            probe_watcher.cancel()
+        
         # Validate recording
         if not os.path.exists(temp_file):
             print(f"[{filename}] FAILED: No output file")
+            trace_capture("no_output")
             return None
         
         file_size = os.path.getsize(temp_file)
+        if trace and probe_end is None and file_size > 0:
+            # Stream opened after the last poll of the probe watcher
+            trace_probe()
+        
         if file_size < 100_000:
             print(f"[{filename}] FAILED: File too small ({file_size} bytes)")
+            trace_capture("too_small", file_size)
             os.remove(temp_file)
             return None
         
         print(f"[{filename}] Recorded {file_size / (1024*1024):.1f}MB")
+        trace_capture("ok", file_size)
         
         # Convert to MP4
         convert_cmd = [
@@ -141,6 +224,8 @@ async def record_stream_async(
         ]
         
         print(f"[{filename}] Converting to MP4...")
+        remux_wall = time.time()
+        remux_at = time.perf_counter()
         
         convert_process = await asyncio.create_subprocess_exec(
             *convert_cmd,
@@ -149,23 +234,28 @@ async def record_stream_async(
         )
         
         try:
-            await asyncio.wait_for(convert_process.wait(), timeout=600)
+            await asyncio.wait_for(convert_process.wait(), timeout=CONVERT_TIMEOUT)
         except asyncio.TimeoutError:
             print(f"[{filename}] Conversion timeout")
+            trace_remux("timeout")
             convert_process.kill()
             await convert_process.wait()
             return None
         
         if not os.path.exists(final_file):
             print(f"[{filename}] Conversion failed")
+            trace_remux("no_output")
             return None
         
         final_size = os.path.getsize(final_file)
         if final_size < 100_000:
             print(f"[{filename}] Converted file too small")
+            trace_remux("too_small", final_size)
             os.remove(final_file)
             return None
         
+        trace_remux("ok", final_size)
+        
         print(f"[{filename}] Success! {final_size / (1024*1024):.1f}MB")
         
         # Cleanup
@@ -176,11 +266,14 @@ async def record_stream_async(
         
         return final_file
         
-    except RecordingCancelled:
-        print(f"[{filename}] Cancelled by user")
-        if process and process.returncode is None:
-            process.kill()
-            await process.wait()
+    except (RecordingCancelled, asyncio.CancelledError):
+        # RecordingCancelled comes from /cancel, CancelledError from the job task
+        print(f"[{filename}] Cancelled")
+        trace_failure("cancelled")
+        for proc in [process, convert_process]:
+            if proc and proc.returncode is None:
+                proc.kill()
+                await proc.wait()
         
         for f in [temp_file, final_file]:
             try:
@@ -192,6 +285,7 @@ async def record_stream_async(
         
     except Exception as e:
         print(f"[{filename}] Exception: {e}")
+        trace_failure(type(e).__name__)
         
         if process and process.returncode is None:
             try:
@@ -201,6 +295,10 @@ async def record_stream_async(
                 pass
         
         return None
+    
+    finally:
+        if probe_watcher:
+            probe_watcher.cancel()
 
 def cleanup_file(filepath: str) -> bool:
     try: